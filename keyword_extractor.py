@@ -1,75 +1,475 @@
-import io
+import asyncio
+import functools
+import hashlib
+import mmap
+import os
+import pickle
+import queue
 import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import ahocorasick
+import aiohttp
 import flet as ft
+import numpy as np
 import pdfplumber
-import requests
-from bs4 import BeautifulSoup
 from docx import Document
+from lxml import etree
+
+try:
+    import hyperscan
+except ImportError:  # brak gotowych pakietów m.in. dla Windows
+    hyperscan = None
 
 # ----------------------------
 # Pomocnicze funkcje
 # ----------------------------
 
-def extract_text_from_url(url: str) -> list:
+# Jeden przebieg zamiast trzech re.sub (-\n -> "", \n+ -> " ", \s{2,} -> " ")
+_WS = re.compile(r"(?:-\n|\s)+")
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+_BLANK_LINES = re.compile(r"\n{2,}")
+
+def _normalize_ws(match) -> str:
+    rest = match.group(0).replace("-\n", "")
+    if not rest:
+        return ""
+    # pojedynczy biały znak inny niż "\n" zostaje bez zmian, jak w starych trzech przebiegach
+    if len(rest) == 1 and rest != "\n":
+        return rest
+    return " "
+
+def split_sentences(text: str) -> list:
+    return [p.strip() for p in _SENTENCE_SPLIT.split(text) if p.strip()]
+
+_HTML_QUEUE_SIZE = 16  # kawałków po 64 KiB czekających na parser
+
+async def extract_text_from_url(url: str, session: aiohttp.ClientSession) -> list:
+    # HTML parsujemy przyrostowo w osobnym wątku, w trakcie pobierania
+    chunks = queue.Queue(maxsize=_HTML_QUEUE_SIZE)
+    aborted = threading.Event()
+    parse_task = None
     try:
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as r:
+            r.raise_for_status()
+            parse_task = asyncio.ensure_future(asyncio.to_thread(_parse_html_chunks, chunks, r.charset, aborted))
+            async for chunk in r.content.iter_chunked(64 * 1024):
+                await _put_chunk(chunks, chunk)
+            await _put_chunk(chunks, None)
+        return await parse_task
     except Exception as e:
+        await _abort_parsing(parse_task, chunks, aborted)
         raise RuntimeError(f"Błąd przy pobieraniu strony: {e}")
-    soup = BeautifulSoup(r.text, "html.parser")
-    paragraphs = [p.get_text(separator=" ").strip() for p in soup.find_all("p") if p.get_text(strip=True)]
+    except asyncio.CancelledError:
+        await _abort_parsing(parse_task, chunks, aborted)
+        raise
+
+async def _put_chunk(chunks: queue.Queue, chunk):
+    try:
+        chunks.put_nowait(chunk)
+    except queue.Full:
+        # parser nie nadąża: czekamy poza pętlą UI, zamiast buforować całą stronę
+        await asyncio.to_thread(chunks.put, chunk)
+
+async def _abort_parsing(parse_task, chunks: queue.Queue, aborted: threading.Event):
+    # wątku nie da się anulować: każemy mu pominąć resztę dokumentu i czekamy, aż skończy
+    aborted.set()
+    if parse_task is not None and not parse_task.done():
+        await _put_chunk(chunks, None)
+        await asyncio.gather(parse_task, return_exceptions=True)
+
+def _parse_html_chunks(chunks: queue.Queue, encoding, aborted: threading.Event) -> list:
+    parser = etree.HTMLParser(encoding=encoding)
+    try:
+        while True:
+            chunk = chunks.get()
+            if chunk is None:
+                break
+            if not aborted.is_set():
+                parser.feed(chunk)
+    except Exception:
+        # odbieramy resztę kawałków, żeby pobieranie nie utknęło na pełnej kolejce
+        aborted.set()
+        while chunks.get() is not None:
+            pass
+        raise
+    if aborted.is_set():
+        return []
+    try:
+        root = parser.close()
+    except etree.XMLSyntaxError:
+        return []  # pusta strona
+    return extract_text_from_html(root)
+
+def extract_text_from_html(root) -> list:
+    # tak jak wcześniej BeautifulSoup.get_text: bez skryptów, stylów i komentarzy
+    etree.strip_elements(root, "script", "style", "template", etree.Comment, with_tail=False)
+    paragraphs = [text for text in (" ".join(p.itertext()).strip() for p in root.iter("p")) if text]
     if not paragraphs:
-        text = soup.get_text("\n")
-        paragraphs = [p.strip() for p in re.split(r"\n{2,}", text) if p.strip()]
+        text = "\n".join(root.itertext())
+        paragraphs = [p.strip() for p in _BLANK_LINES.split(text) if p.strip()]
     return paragraphs
 
-def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> list:
+def extract_text_from_pdf_stream(stream) -> list:
     paragraphs = []
     try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        with pdfplumber.open(stream) as pdf:
             for page in pdf.pages:
                 text = page.extract_text() or ""
-                text = re.sub(r"-\n", "", text)
-                text = re.sub(r"\n+", " ", text)
-                text = re.sub(r"\s{2,}", " ", text)
-                page_pars = [p.strip() for p in re.split(r"(?<=[.!?])\s+", text) if p.strip()]
-                paragraphs.extend(page_pars)
+                paragraphs.extend(split_sentences(_WS.sub(_normalize_ws, text)))
     except Exception as e:
         raise RuntimeError(f"Błąd przy odczycie PDF: {e}")
     return paragraphs
 
-def paragraph_matches(paragraph: str, keywords: list) -> bool:
-    for kw in keywords:
-        if not kw:
+def extract_text_from_pdf_file(path: str) -> list:
+    # mmap zamiast read(): pdfplumber czyta strony leniwie prosto z cache stron systemu,
+    # bez kopii całego pliku w pamięci procesu
+    with open(path, "rb") as fh:
+        try:
+            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:  # pusty plik
+            raise RuntimeError(f"Błąd przy odczycie PDF: {e}")
+        with mapped:
+            return extract_text_from_pdf_stream(mapped)
+
+# Akapity z już przetworzonych PDF-ów: (wersja, ścieżka, mtime, rozmiar) -> lista akapitów.
+# Wszystkie funkcje cache robią I/O, więc wołamy je przez asyncio.to_thread.
+_PDF_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "extractor")
+# zwiększyć przy każdej zmianie wyniku ekstrakcji (normalizacja, podział na zdania), żeby unieważnić stare wpisy
+_PDF_CACHE_VERSION = 1
+_PDF_CACHE_TMP_MAX_AGE = 3600  # s; starsze pliki .tmp to pozostałości po przerwanym zapisie
+_PDF_CACHE_SIZE = 32  # wpisów w pamięci
+_PDF_DISK_CACHE_SIZE = 64  # plików w _PDF_CACHE_DIR
+_pdf_cache = OrderedDict()
+_pdf_cache_lock = threading.Lock()
+
+def pdf_cache_key(path: str):
+    try:
+        st = os.stat(path)
+    except (OSError, TypeError):  # brak pliku albo brak ścieżki (np. w trybie web)
+        return None
+    return (_PDF_CACHE_VERSION, os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+def _pdf_cache_file(key: tuple) -> str:
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+    return os.path.join(_PDF_CACHE_DIR, f"v{_PDF_CACHE_VERSION}-{digest}.pickle")
+
+def _remember_pdf(key: tuple, paragraphs: list):
+    with _pdf_cache_lock:
+        _pdf_cache[key] = paragraphs
+        _pdf_cache.move_to_end(key)
+        while len(_pdf_cache) > _PDF_CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+
+def load_cached_pdf_paragraphs(key):
+    if key is None:
+        return None
+    with _pdf_cache_lock:
+        if key in _pdf_cache:
+            _pdf_cache.move_to_end(key)
+            return _pdf_cache[key]
+    cache_file = _pdf_cache_file(key)
+    try:
+        with open(cache_file, "rb") as fh:
+            paragraphs = pickle.load(fh)
+        os.utime(cache_file)  # mtime pliku służy do usuwania najdawniej używanych
+    except Exception:
+        return None
+    _remember_pdf(key, paragraphs)
+    return paragraphs
+
+def _prune_pdf_disk_cache():
+    entries = []
+    stale = []
+    prefix = f"v{_PDF_CACHE_VERSION}-"
+    for entry in os.scandir(_PDF_CACHE_DIR):
+        try:
+            mtime_ns = entry.stat().st_mtime_ns
+        except OSError:
             continue
-        pattern = r"\b" + re.escape(kw) + r"\b"
-        if re.search(pattern, paragraph, flags=re.IGNORECASE):
-            return True
-    return False
-
-def bold_keywords(paragraph: str, keywords: list) -> str:
-    def replacer(match):
-        return f"*{match.group(0)}*"
+        if entry.name.endswith(".pickle"):
+            if entry.name.startswith(prefix):
+                entries.append((mtime_ns, entry.path))
+            else:
+                stale.append(entry.path)  # wpis ze starszej wersji ekstrakcji
+        elif entry.name.endswith(".tmp") and time.time() - mtime_ns / 1e9 > _PDF_CACHE_TMP_MAX_AGE:
+            stale.append(entry.path)
+    entries.sort(reverse=True)
+    for cache_file in stale + [path for _, path in entries[_PDF_DISK_CACHE_SIZE:]]:
+        try:
+            os.remove(cache_file)
+        except OSError:
+            pass
+
+def store_cached_pdf_paragraphs(key, paragraphs: list):
+    # key liczony przed parsowaniem: jeśli plik zmienił się w trakcie, wpis po prostu nie trafi
+    if key is None:
+        return
+    _remember_pdf(key, paragraphs)
+    try:
+        os.makedirs(_PDF_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=_PDF_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump(paragraphs, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _pdf_cache_file(key))
+        _prune_pdf_disk_cache()
+    except OSError:
+        pass  # cache na dysku jest tylko optymalizacją
+
+def load_cached_pdfs(paths: list) -> tuple:
+    keys = [pdf_cache_key(path) for path in paths]
+    return keys, [load_cached_pdf_paragraphs(key) for key in keys]
+
+def store_cached_pdfs(entries: list):
+    for key, paragraphs in entries:
+        store_cached_pdf_paragraphs(key, paragraphs)
+
+_pdf_executor = None
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    global _pdf_executor
+    if _pdf_executor is None:
+        _pdf_executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+    return _pdf_executor
+
+def reset_pdf_executor():
+    global _pdf_executor
+    # po śmierci procesu roboczego (np. OOM) pula jest zepsuta na stałe; następne przetwarzanie utworzy nową
+    if _pdf_executor is not None:
+        _pdf_executor.shutdown(wait=False, cancel_futures=True)
+        _pdf_executor = None
+
+# Litery, które re.IGNORECASE uznaje za równe, choć str.lower() daje dla nich różne znaki
+# (tabela _EXTRA_CASES z modułu re); każdą grupę sprowadzamy do jej pierwszego znaku
+_CASE_EQUIVALENCES = (
+    "\u0069\u0131",  # i ı
+    "\u0073\u017f",  # s ſ
+    "\u00b5\u03bc",  # µ μ
+    "\u0345\u03b9\u1fbe",  # ͅ ι ι
+    "\u0390\u1fd3",  # ΐ ΐ
+    "\u03b0\u1fe3",  # ΰ ΰ
+    "\u03b2\u03d0",  # β ϐ
+    "\u03b5\u03f5",  # ε ϵ
+    "\u03b8\u03d1",  # θ ϑ
+    "\u03ba\u03f0",  # κ ϰ
+    "\u03c0\u03d6",  # π ϖ
+    "\u03c1\u03f1",  # ρ ϱ
+    "\u03c3\u03c2",  # σ ς
+    "\u03c6\u03d5",  # φ ϕ
+    "\u0432\u1c80",  # в ᲀ
+    "\u0434\u1c81",  # д ᲁ
+    "\u043e\u1c82",  # о ᲂ
+    "\u0441\u1c83",  # с ᲃ
+    "\u0442\u1c84\u1c85",  # т ᲄ ᲅ
+    "\u044a\u1c86",  # ъ ᲆ
+    "\u0463\u1c87",  # ѣ ᲇ
+    "\u1c88\ua64b",  # ᲈ ꙋ
+    "\u1e61\u1e9b",  # ṡ ẛ
+    "\ufb05\ufb06",  # ﬅ ﬆ
+)
+_CASE_FOLD = str.maketrans({c: group[0] for group in _CASE_EQUIVALENCES for c in group[1:]})
+# translate() na tekście spoza ASCII jest wolny, więc wołamy go tylko, gdy jest co zamieniać
+_CASE_FOLD_CHARS = re.compile("[" + "".join(group[1:] for group in _CASE_EQUIVALENCES) + "]")
+
+def _fold_case(text: str) -> str:
+    # Porównanie jak w re.IGNORECASE, a przy tym ta sama długość co oryginał (offsety trafień):
+    # "İ".lower() ma 2 znaki, a re zamienia "İ" na samo "i"
+    lowered = text.replace("\u0130", "i").lower()
+    if not lowered.isascii() and _CASE_FOLD_CHARS.search(lowered):
+        lowered = lowered.translate(_CASE_FOLD)
+    return lowered
+
+_CASE_GROUPS = {group[0]: group for group in _CASE_EQUIVALENCES}
+# wielkie litery, których str.upper() ani str.title() nie zwraca dla ich małej litery: İ ϴ ẞ Ω K Å
+_EXTRA_CAPITALS = "\u0130\u03f4\u1e9e\u2126\u212a\u212b"
+
+@functools.lru_cache(maxsize=None)
+def _case_variants(c: str) -> tuple:
+    # wszystkie znaki, które re.IGNORECASE uznaje za równe c
+    folded = _fold_case(c)
+    group = _CASE_GROUPS.get(folded, folded)
+    candidates = set(group) | set(_EXTRA_CAPITALS)
+    for g in group:
+        candidates.update(x for x in (g.upper(), g.title()) if len(x) == 1)
+    return tuple(sorted(x for x in candidates if _fold_case(x) == folded))
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+def _is_boundary(text: str, i: int) -> bool:
+    # to samo co \b w re
+    before = i > 0 and _is_word_char(text[i - 1])
+    after = i < len(text) and _is_word_char(text[i])
+    return before != after
+
+def build_keyword_automaton(keywords: list):
+    automaton = ahocorasick.Automaton()
     for kw in keywords:
-        if not kw:
-            continue
-        pattern = re.compile(rf"\b{re.escape(kw)}\b", flags=re.IGNORECASE)
-        paragraph = pattern.sub(replacer, paragraph)
-    return paragraph
-
-def build_result_text_with_sources(matching_paragraphs: list, keywords: list) -> str:
-    lines = []
-    for source, paragraph in matching_paragraphs:
-        paragraph_bolded = bold_keywords(paragraph, keywords)
-        lines.append(f"**Źródło: {source}**\n\n{paragraph_bolded}\n")
-    return "\n---\n".join(lines)
-
-def save_as_docx(text: str, path: str):
-    clean_text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
+        key = _fold_case(kw)
+        automaton.add_word(key, len(key))
+    automaton.make_automaton()
+    return automaton
+
+def iter_keyword_spans(paragraph: str, automaton):
+    for end, length in automaton.iter(_fold_case(paragraph)):
+        start = end - length + 1
+        if _is_boundary(paragraph, start) and _is_boundary(paragraph, end + 1):
+            yield start, end + 1
+
+def paragraph_matches(paragraph: str, automaton) -> bool:
+    return next(iter_keyword_spans(paragraph, automaton), None) is not None
+
+def _keyword_expression(keyword: str) -> str:
+    # HS_FLAG_CASELESS zna tylko część par z re.IGNORECASE (m.in. bez _CASE_EQUIVALENCES
+    # i nowszych liter Unicode), więc poza ASCII wypisujemy wszystkie warianty jawnie
+    parts = []
+    for c in keyword:
+        variants = _case_variants(c)
+        if len(variants) > 1 and not all(v.isascii() for v in variants):
+            parts.append(f"(?:{'|'.join(map(re.escape, variants))})")
+        else:
+            parts.append(re.escape(c))
+    return "".join(parts)
+
+def build_keyword_database(keywords: list):
+    if hyperscan is None:
+        return None
+    # \b nie działa w trybie UCP, więc Hyperscan szuka samych podciągów, a granice słów sprawdza automat
+    expressions = [_keyword_expression(kw).encode("utf-8") for kw in keywords]
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8
+    db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+    db.compile(
+        expressions=expressions,
+        ids=list(range(len(expressions))),
+        elements=len(expressions),
+        flags=[flags] * len(expressions),
+    )
+    return db
+
+def _scan_ends(db, data: memoryview, start: int, end: int) -> list:
+    # osobny scratch, bo jeden scratch nie może być używany przez kilka wątków naraz
+    ends = []
+    db.scan(
+        data[start:end],
+        match_event_handler=lambda _id, _start, match_end, _flags, _ctx: ends.append(start + match_end),
+        scratch=hyperscan.Scratch(db),
+    )
+    return ends
+
+def find_matching_indices(corpus, automaton, db=None) -> np.ndarray:
+    if db is not None:
+        # każde źródło skanowane w osobnym wątku (Hyperscan zwalnia GIL na czas skanu);
+        # kandydatów potwierdza potem automat (granice słów)
+        ranges = corpus.source_byte_ranges()
+        data = memoryview(corpus.data)
+        with ThreadPoolExecutor(max_workers=max(1, min(len(ranges), os.cpu_count() or 1))) as executor:
+            chunks = list(executor.map(lambda r: _scan_ends(db, data, *r), ranges))
+        ends = [end for chunk in chunks for end in chunk]
+        candidates = _paragraphs_at(corpus.byte_starts, np.array(ends, dtype=np.int64) - 1)
+        return np.array(
+            [i for i in candidates.tolist() if paragraph_matches(corpus.paragraph(i), automaton)],
+            dtype=np.int64,
+        )
+    text = corpus.data.decode("utf-8")
+    starts = [start for start, _ in iter_keyword_spans(text, automaton)]
+    return _paragraphs_at(corpus.char_starts, np.array(starts, dtype=np.int64))
+
+def group_matches_by_source(corpus, indices: np.ndarray) -> dict:
+    matches = {source: [] for source in corpus.sources}
+    for i, key in zip(indices.tolist(), corpus.keys[indices].tolist()):
+        matches[corpus.sources[corpus.source_ids[i]]].append((corpus.paragraph(i), key))
+    return matches
+
+def match_paragraphs_by_source(source_paragraphs: dict, automaton, db=None) -> dict:
+    corpus = ParagraphCorpus(source_paragraphs)
+    return group_matches_by_source(corpus, find_matching_indices(corpus, automaton, db))
+
+def keyword_spans(paragraph: str, automaton) -> list:
+    spans = []
+    pos = 0
+    # najwcześniejsze, a przy remisie najdłuższe trafienia, bez nakładania się
+    for start, end in sorted(iter_keyword_spans(paragraph, automaton), key=lambda s: (s[0], -s[1])):
+        if start >= pos:
+            spans.append((start, end))
+            pos = end
+    return spans
+
+def dedup_key(paragraph: str) -> int:
+    return hash(paragraph[:200])
+
+def _starts(lengths: list) -> np.ndarray:
+    # początek akapitu = suma długości poprzednich + 1 znak separatora na każdy
+    starts = np.zeros(len(lengths), dtype=np.int64)
+    if lengths:
+        starts[1:] = np.cumsum(np.array(lengths[:-1], dtype=np.int64) + 1)
+    return starts
+
+def _paragraphs_at(starts: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    return np.unique(np.searchsorted(starts, offsets, side="right") - 1)
+
+class ParagraphCorpus:
+    # Tymczasowy bufor do skanowania: akapity wszystkich źródeł złączone w jeden ciąg UTF-8
+    # (rozdzielone "\n") + tablice offsetów. Akapity nadal trzymamy jako listy str (cache, źródła);
+    # bufor powstaje przy każdym przetwarzaniu i jest odrzucany po wyznaczeniu dopasowań.
+    def __init__(self, source_paragraphs: dict):
+        self.sources = list(source_paragraphs)
+        encoded = []
+        char_lengths = []
+        source_ids = []
+        keys = []
+        for source_id, paragraphs in enumerate(source_paragraphs.values()):
+            for p in paragraphs:
+                encoded.append(p.encode("utf-8"))
+                char_lengths.append(len(p))
+                source_ids.append(source_id)
+                keys.append(dedup_key(p))
+        self.data = b"\n".join(encoded)
+        self.byte_lengths = np.array([len(b) for b in encoded], dtype=np.int64)
+        self.byte_starts = _starts(self.byte_lengths.tolist())
+        self.char_starts = _starts(char_lengths)
+        self.source_ids = np.array(source_ids, dtype=np.int32)
+        self.keys = np.array(keys, dtype=np.int64)
+
+    def paragraph(self, i: int) -> str:
+        start = self.byte_starts[i]
+        return self.data[start:start + self.byte_lengths[i]].decode("utf-8")
+
+    def source_byte_ranges(self) -> list:
+        # akapity źródła leżą w buforze jeden po drugim, więc źródło to ciągły zakres bajtów
+        bounds = np.searchsorted(self.source_ids, np.arange(len(self.sources) + 1)).tolist()
+        ranges = []
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            if first < last:
+                ranges.append((int(self.byte_starts[first]), int(self.byte_starts[last - 1] + self.byte_lengths[last - 1])))
+        return ranges
+
+def build_result_entry(source: str, paragraph: str, automaton) -> ft.Control:
+    spans = []
+    pos = 0
+    for start, end in keyword_spans(paragraph, automaton):
+        if pos < start:
+            spans.append(ft.TextSpan(paragraph[pos:start]))
+        spans.append(ft.TextSpan(paragraph[start:end], style=ft.TextStyle(weight=ft.FontWeight.BOLD)))
+        pos = end
+    if pos < len(paragraph):
+        spans.append(ft.TextSpan(paragraph[pos:]))
+    return ft.Column([
+        ft.Text(f"Źródło: {source}", weight=ft.FontWeight.BOLD, selectable=True),
+        ft.Text(spans=spans, selectable=True),
+        ft.Divider(),
+    ])
+
+def save_as_docx(matching_paragraphs: list, path: str):
     doc = Document()
-    for paragraph in clean_text.split("\n\n"):
-        if paragraph.strip():
-            doc.add_paragraph(paragraph.strip())
+    for i, (source, paragraph) in enumerate(matching_paragraphs):
+        if i:
+            doc.add_paragraph("---")
+        doc.add_paragraph(f"Źródło: {source}")
+        doc.add_paragraph(paragraph)
     doc.save(path)
 
 def shorten_text(text, max_len=40):
@@ -82,7 +482,7 @@ def shorten_text(text, max_len=40):
 # Główna aplikacja Flet
 # ----------------------------
 
-def main(page: ft.Page):
+async def main(page: ft.Page):
 
     page.title = "Extractor: akapity ze słowami kluczowymi"
     page.padding = 20
@@ -97,119 +497,168 @@ def main(page: ft.Page):
 
     picked_files_display = ft.Text("Brak wybranych plików")
 
-    source_paragraphs = {}
-    keywords = []
+    # Jedna sesja HTTP na stronę: kolejne zapytania używają tych samych połączeń (keep-alive)
+    http_session = aiohttp.ClientSession()
+
+    async def close_http_session(e=None):
+        await http_session.close()
+
+    page.on_close = close_http_session
+
+    keyword_automaton = None
+    # źródło -> [(akapit, klucz deduplikacji)] pasujące do bieżących słów kluczowych
+    matches_by_source = {}
 
     source_checkboxes = {}
     filter_column = ft.Column()
 
-    def pick_files_result(e: ft.FilePickerResultEvent):
+    async def pick_files_result(e: ft.FilePickerResultEvent):
         if e.files:
             names = ", ".join([f.name for f in e.files])
             picked_files_display.value = names
         else:
             picked_files_display.value = "Brak wybranych plików"
-        page.update()
+        await page.update_async()
 
     file_picker.on_result = pick_files_result
 
-    output_area = ft.Markdown(value="", selectable=True, expand=True)
+    result_list = ft.ListView(expand=True, spacing=10, padding=10, auto_scroll=True)
+    # (źródło, klucz deduplikacji) -> gotowa kontrolka wyniku; przy przełączaniu
+    # źródeł Flet wysyła tylko kontrolki dodane lub usunięte z listy
+    result_entries = {}
+    # (źródło, akapit) aktualnie widoczne w wynikach; z nich powstaje tekst do DOCX
+    result_paragraphs = []
 
     progress_bar = ft.ProgressBar(width=700, value=0, visible=False)
     progress_text = ft.Text("", visible=False)
 
-    def update_output(e=None):
-        selected_sources = [src for src, cb in source_checkboxes.items() if cb.value]
+    async def update_output(e=None):
         matching_paragraphs = []
+        controls = []
         seen = set()
-        for source in selected_sources:
-            paragraphs = source_paragraphs.get(source, [])
-            for p in paragraphs:
-                if paragraph_matches(p, keywords):
-                    key = p[:200]
-                    if key not in seen:
-                        matching_paragraphs.append((source, p))
-                        seen.add(key)
-        result_text = build_result_text_with_sources(matching_paragraphs, keywords)
-        output_area.value = result_text
-        page.update()
-
-    def process_click(e):
-        nonlocal source_paragraphs, keywords
+        for source, cb in source_checkboxes.items():
+            if not cb.value:
+                continue
+            for p, key in matches_by_source.get(source, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                matching_paragraphs.append((source, p))
+                entry = result_entries.get((source, key))
+                if entry is None:
+                    entry = result_entries[(source, key)] = build_result_entry(source, p, keyword_automaton)
+                controls.append(entry)
+        result_paragraphs[:] = matching_paragraphs
+        result_list.controls = controls
+        await page.update_async()
+
+    async def process_click(e):
+        # Flet obsługuje każde zdarzenie w osobnym zadaniu, więc drugie kliknięcie
+        # w trakcie przetwarzania wystartowałoby równolegle
+        if process_btn.disabled:
+            return
 
         url = url_field.value.strip()
         keywords_raw = keywords_field.value.strip()
 
         if not url and not file_picker.result:
             page.snack_bar = ft.SnackBar(ft.Text("Podaj URL lub wybierz plik(i) PDF"), open=True)
-            page.update()
+            await page.update_async()
             return
         if not keywords_raw:
             page.snack_bar = ft.SnackBar(ft.Text("Podaj przynajmniej jedno słowo kluczowe"), open=True)
-            page.update()
+            await page.update_async()
             return
 
         keywords = [k.strip() for k in re.split(r"[\s,]+", keywords_raw) if k.strip()]
+        process_btn.disabled = True
+        try:
+            await process_sources(url, keywords)
+        finally:
+            process_btn.disabled = False
+            await page.update_async()
+
+    async def process_sources(url: str, keywords: list):
+        nonlocal keyword_automaton, matches_by_source
+
+        # automat i baza Hyperscan muszą pochodzić z tych samych słów kluczowych,
+        # więc stan strony podmieniamy dopiero na końcu
+        automaton = build_keyword_automaton(keywords)
+        keyword_db = build_keyword_database(keywords)
         source_paragraphs = {}
 
-        filter_column.controls.clear()
-        source_checkboxes.clear()
-
         progress_bar.visible = True
         progress_text.visible = True
-        page.update()
-
-        if url:
-            try:
-                url_pars = extract_text_from_url(url)
-                source_paragraphs[f"URL: {url}"] = url_pars
-            except Exception as ex:
-                page.snack_bar = ft.SnackBar(ft.Text(str(ex)), open=True)
-                progress_bar.visible = False
-                progress_text.visible = False
-                page.update()
-                return
-
-        if file_picker.result and file_picker.result.files:
-            total_files = len(file_picker.result.files)
-            for i, f in enumerate(file_picker.result.files):
-                try:
-                    with open(f.path, "rb") as fh:
-                        pdf_bytes = fh.read()
-                    pdf_pars = extract_text_from_pdf_bytes(pdf_bytes)
-                    source_paragraphs[f"Plik PDF: {f.name}"] = pdf_pars
-                except Exception as ex:
-                    page.snack_bar = ft.SnackBar(ft.Text(str(ex)), open=True)
-                    progress_bar.visible = False
-                    progress_text.visible = False
-                    page.update()
-                    return
-                progress_bar.value = (i + 1) / total_files
-                progress_text.value = f"Przetwarzanie plików: {i+1}/{total_files}"
-                page.update()
+        await page.update_async()
+
+        # Pobieranie strony i parsowanie PDF-ów idą równolegle
+        url_task = asyncio.create_task(extract_text_from_url(url, http_session)) if url else None
+        files = file_picker.result.files if file_picker.result and file_picker.result.files else []
+        # Niezmienione od ostatniego razu PDF-y bierzemy z cache zamiast parsować ponownie
+        cache_keys, cached = await asyncio.to_thread(load_cached_pdfs, [f.path for f in files])
+        to_parse = [i for i, pdf_pars in enumerate(cached) if pdf_pars is None]
+        pdf_tasks = {}
+
+        try:
+            if to_parse:
+                # Odczyt i parsowanie (czysty Python, trzyma GIL) zawsze w osobnych procesach,
+                # także dla jednego pliku, żeby nie konkurować z pętlą UI
+                loop = asyncio.get_running_loop()
+                executor = get_pdf_executor()
+                for i in to_parse:
+                    pdf_tasks[i] = loop.run_in_executor(executor, extract_text_from_pdf_file, files[i].path)
+            if url_task:
+                source_paragraphs[f"URL: {url}"] = await url_task
+            total_files = len(files)
+            for done, task in enumerate(asyncio.as_completed(pdf_tasks.values()), start=total_files - len(pdf_tasks) + 1):
+                await task
+                progress_bar.value = done / total_files
+                progress_text.value = f"Przetwarzanie plików: {done}/{total_files}"
+                await page.update_async()
+        except Exception as ex:
+            if url_task:
+                url_task.cancel()
+            for task in pdf_tasks.values():
+                task.cancel()
+            if isinstance(ex, BrokenProcessPool):
+                reset_pdf_executor()
+            page.snack_bar = ft.SnackBar(ft.Text(str(ex)), open=True)
+            progress_bar.visible = False
+            progress_text.visible = False
+            await page.update_async()
+            return
+
+        parsed = {i: task.result() for i, task in pdf_tasks.items()}
+        if parsed:
+            await asyncio.to_thread(store_cached_pdfs, [(cache_keys[i], pdf_pars) for i, pdf_pars in parsed.items()])
+        for i, f in enumerate(files):
+            source_paragraphs[f"Plik PDF: {f.name}"] = cached[i] if cached[i] is not None else parsed[i]
+
+        # Dopasowania liczymy raz tutaj, w wątku roboczym; przełączanie checkboxów tylko składa gotowe listy
+        matches = await asyncio.to_thread(match_paragraphs_by_source, source_paragraphs, automaton, keyword_db)
+
+        keyword_automaton = automaton
+        matches_by_source = matches
+        result_entries.clear()
+        filter_column.controls.clear()
+        source_checkboxes.clear()
 
         progress_bar.visible = False
         progress_text.visible = False
 
         # Dodaj checkboxy filtrów z ograniczoną długością nazwy i tooltipem
-        for source in source_paragraphs.keys():
+        for source in matches_by_source:
             label = shorten_text(source, max_len=40)
             cb = ft.Checkbox(label=label, value=True, on_change=update_output, width=280)
             container = ft.Container(content=cb, width=280, tooltip=source)
             source_checkboxes[source] = cb
             filter_column.controls.append(container)
-        page.update()
+        await page.update_async()
 
-        update_output()
+        await update_output()
 
     result_container = ft.Container(
-        content=ft.ListView(
-            controls=[output_area],
-            expand=True,
-            spacing=10,
-            padding=10,
-            auto_scroll=True,
-        ),
+        content=result_list,
         width=700,
         height=400,
         border=ft.border.all(1),
@@ -220,23 +669,27 @@ def main(page: ft.Page):
     save_picker = ft.FilePicker()
     page.overlay.append(save_picker)
 
-    def on_save_result(ev: ft.FilePickerResultEvent):
+    async def on_save_result(ev: ft.FilePickerResultEvent):
         if not ev.path:
             return
         path = ev.path
         if not path.lower().endswith(".docx"):
             path = path.rstrip(".") + ".docx"
         try:
-            save_as_docx(output_area.value, path)
+            # duży eksport nie blokuje okna; kopia listy, bo update_output może ją podmienić w trakcie zapisu
+            await asyncio.to_thread(save_as_docx, list(result_paragraphs), path)
             page.snack_bar = ft.SnackBar(ft.Text(f"Zapisano: {path}"), open=True)
         except Exception as err:
             page.snack_bar = ft.SnackBar(ft.Text(f"Błąd zapisu: {err}"), open=True)
-        page.update()
+        await page.update_async()
 
     save_picker.on_result = on_save_result
 
-    def save_to_disk(_e=None):
-        save_picker.save_file(allowed_extensions=["docx"])
+    async def save_to_disk(_e=None):
+        await save_picker.save_file_async(allowed_extensions=["docx"])
+
+    async def pick_pdf_files(_e=None):
+        await file_picker.pick_files_async(allow_multiple=True, allowed_extensions=["pdf"])
 
     save_button = ft.ElevatedButton("💾 Zapisz wynik", on_click=save_to_disk)
     process_btn = ft.ElevatedButton("Przetwórz", on_click=process_click)
@@ -252,15 +705,12 @@ def main(page: ft.Page):
         margin=10,
     )
 
-    page.add(
+    await page.add_async(
         ft.Column([
             ft.Text("Extractor - znajdź akapity ze słowami kluczowymi", style="headlineMedium"),
             url_field,
             ft.Row([
-                ft.ElevatedButton(
-                    "Wybierz PDF(y)",
-                    on_click=lambda e: file_picker.pick_files(allow_multiple=True, allowed_extensions=["pdf"]),
-                ),
+                ft.ElevatedButton("Wybierz PDF(y)", on_click=pick_pdf_files),
                 picked_files_display,
             ]),
             keywords_field,